@@ -1,12 +1,25 @@
 """
 Tools to load and dump factorio blueprints.
 """
-import base64
 import json
 import os
 import os.path
 from typing import Dict
-import zlib
+
+try:
+    from isal import isal_zlib as zlib
+except ImportError:
+    import zlib
+
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 def loads(blob: str):
@@ -15,24 +28,48 @@ def loads(blob: str):
     """
     if isinstance(blob, str):
         blob = blob.encode('ascii')
-    ver, data = blob[0:1], blob[1:]
-    assert ver == b'0'
-    compressed = base64.b64decode(data)
+    assert blob[0:1] == b'0'
+    # memoryview so the payload isn't copied before decoding
+    compressed = base64.b64decode(memoryview(blob)[1:], validate=False)
     txt = zlib.decompress(compressed)
-    return json.loads(txt.decode('utf-8'))
+    if orjson is not None:
+        return orjson.loads(txt)
+    return json.loads(txt)
 
 
-def dumps(data: dict):
+def _compression_level(level: int) -> int:
+    """
+    Map a standard zlib level (-1, 0-9) onto whichever zlib backend is loaded.
+
+    isal only accepts 0-3, so -1 becomes its default and anything higher than
+    its best level is clamped to it. Stdlib zlib gets the level unchanged.
+    """
+    if level < 0:
+        return zlib.Z_DEFAULT_COMPRESSION
+    return min(level, zlib.Z_BEST_COMPRESSION)
+
+
+def dumps(data: dict, level: int = -1):
     """
     Given a JSON structure, dump into a blueprint string.
+
+    Args:
+        data (dict): blueprint structure
+        level (int): standard zlib compression level, -1 (default) or 0-9.
+            With isal, -1 uses isal's default and levels above 3 are
+            clamped to 3, its best compression.
     """
-    # Thanks agmlego
-    json_str = json.dumps(
-        data,
-        separators=(',', ':'),
-        ensure_ascii=False
-    ).encode('utf8')
-    compressed = zlib.compress(json_str, 9)
+    if orjson is not None:
+        # Already compact UTF-8 bytes
+        json_str = orjson.dumps(data)
+    else:
+        # Thanks agmlego
+        json_str = json.dumps(
+            data,
+            separators=(',', ':'),
+            ensure_ascii=False
+        ).encode('utf8')
+    compressed = zlib.compress(json_str, _compression_level(level))
     encoded = base64.b64encode(compressed)
     return '0' + encoded.decode('ascii')
 
@@ -46,8 +83,12 @@ def dump(data: dict, filename: str):
         filename (str): file to create
     """
     os.makedirs(os.path.dirname(filename), exist_ok=True)
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+    if orjson is not None:
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
     
 def histogram(data: dict) -> Dict[str,int]:
     """
@@ -60,22 +101,15 @@ def histogram(data: dict) -> Dict[str,int]:
         Dict[str,int]: histogram of item:count
     """
     items = {}
-    if 'blueprint_book' in data:
-        items.update(_book_histogram(data['blueprint_book'],items))
-    elif 'blueprint' in data:
-        items.update(_blueprint_histogram(data['blueprint'],items))
-    
-    return items
-
-def _book_histogram(data: dict, items:Dict[str,int]=None) -> Dict[str,int]:
-    if items is None:
-        items = {}
-    
-    for blueprint in data['blueprints']:
-        if 'blueprint_book' in blueprint:
-            items.update(_book_histogram(blueprint['blueprint_book'],items))
-        elif 'blueprint' in blueprint:
-            items.update(_blueprint_histogram(blueprint['blueprint'],items))
+    # Walk nested books with an explicit stack instead of recursing. Children
+    # are pushed in reverse so they're still visited in book order.
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if 'blueprint_book' in node:
+            stack.extend(reversed(node['blueprint_book']['blueprints']))
+        elif 'blueprint' in node:
+            _blueprint_histogram(node['blueprint'], items)
 
     return items
 
@@ -85,13 +119,11 @@ def _blueprint_histogram(data: dict, items:Dict[str,int]=None) -> Dict[str,int]:
 
     if 'entities' in data:
         for entity in data['entities']:
-            if entity['name'] not in items:
-                items[entity['name']] = 0
-            items[entity['name']] += 1
+            name = entity['name']
+            items[name] = items.get(name, 0) + 1
     if 'tiles' in data:
         for tile in data['tiles']:
-            if tile['name'] not in items:
-                items[tile['name']] = 0
-            items[tile['name']] += 1
+            name = tile['name']
+            items[name] = items.get(name, 0) + 1
 
     return items
\ No newline at end of file
@@ -1,43 +1,118 @@
-from typing import Callable
+import functools
+from typing import Callable, Union
+import numpy as np
 from colorhash import ColorHash
 from colormath.color_objects import LabColor, sRGBColor
 from colormath.color_conversions import convert_color
 from colormath.color_diff import delta_e_cie1994 as delta_e
 
 
-def colorhash_to_srgb(color: ColorHash) -> sRGBColor:
-    r, g, b = color.rgb
+# A ColorHash, or the 0-255 (r, g, b) tuple already pulled out of one
+Color = Union[ColorHash, tuple[int, int, int]]
+
+
+def _rgb(color: Color) -> tuple[int, int, int]:
+    # ColorHash.rgb is a property that redoes the HSL conversion on every access
+    if isinstance(color, ColorHash):
+        return color.rgb
+    return tuple(color)
+
+
+def colorhash_to_srgb(color: Color) -> sRGBColor:
+    r, g, b = _rgb(color)
     return sRGBColor(r, g, b, is_upscaled=True)
 
 
-def colorhash_delta_e(color1: ColorHash, color2: ColorHash) -> float:
-    color1 = convert_color(colorhash_to_srgb(color1), LabColor)
-    color2 = convert_color(colorhash_to_srgb(color2), LabColor)
-    return delta_e(color1, color2)
+@functools.lru_cache(maxsize=None)
+def _rgb_to_labcolor(rgb: tuple[int, int, int]) -> LabColor:
+    return convert_color(sRGBColor(*rgb, is_upscaled=True), LabColor)
+
+
+def colorhash_to_lab(color: Color) -> LabColor:
+    return _rgb_to_labcolor(_rgb(color))
+
+
+def colorhash_delta_e(color1: Color, color2: Color) -> float:
+    return delta_e(colorhash_to_lab(color1), colorhash_to_lab(color2))
+
+
+# sRGB (D65) -> XYZ, same matrix & white point colormath uses
+_SRGB_TO_XYZ = np.array([
+    [0.412424, 0.357579, 0.180464],
+    [0.212656, 0.715158, 0.0721856],
+    [0.0193324, 0.119193, 0.950444],
+])
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+_CIE_E = 216 / 24389
 
 
-def find_confusion_matrix(colormap: dict[str, ColorHash], distance: Callable[[ColorHash, ColorHash], float] = colorhash_delta_e) -> list[tuple[str, str, float]]:
+def _rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """
+    Convert an [N,3] array of 0-255 sRGB values to an [N,3] array of Lab
+    """
+    v = rgb / 255
+    linear = np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _SRGB_TO_XYZ.T / _D65_WHITE
+    f = np.where(xyz > _CIE_E, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack([
+        116 * f[:, 1] - 16,
+        500 * (f[:, 0] - f[:, 1]),
+        200 * (f[:, 1] - f[:, 2]),
+    ], axis=1)
+
+
+def _delta_e_cie1994_matrix(labs: np.ndarray, K_1=0.045, K_2=0.015) -> np.ndarray:
+    """
+    Pairwise CIE1994 delta E of an [N,3] Lab array, D[i, j] == delta_e(i, j)
+    """
+    diff = labs[:, None, :] - labs[None, :, :]
+    chroma = np.hypot(labs[:, 1], labs[:, 2])
+    delta_L = diff[..., 0]
+    delta_C = chroma[:, None] - chroma[None, :]
+    delta_H_sq = diff[..., 1] ** 2 + diff[..., 2] ** 2 - delta_C ** 2
+    S_C = 1 + K_1 * chroma[:, None]
+    S_H = 1 + K_2 * chroma[:, None]
+    return np.sqrt(delta_L ** 2 + (delta_C / S_C) ** 2 + delta_H_sq.clip(min=0) / S_H ** 2)
+
+
+def find_confusion_matrix(colormap: dict[str, Color], distance: Callable[[Color, Color], float] = colorhash_delta_e, symmetric: bool = False) -> list[tuple[str, str, float]]:
     """
     Generate the confusion pairs based on color distance
 
     Args:
-        colormap (dict[str, ColorHash]): A dict of tagged colors
-        distance (Callable[[ColorHash, ColorHash], float]): A distance metric between colors
+        colormap (dict[str, Color]): A dict of tagged colors, as ColorHash or (r, g, b) tuples
+        distance (Callable[[Color, Color], float]): A distance metric between colors
+        symmetric (bool): distance(a, b) == distance(b, a), so only half the pairs need measuring.
+            CIE1994 (the default) is not symmetric.
 
     Returns:
         list[tuple[str, str, float]]: A list of tuples, with (tag1, tag2, min_dist) structure
     """
-    confusion = []
-    for tag1, color1 in colormap.items():
-        min_dist = float('inf')
-        min_tag = ''
-        for tag2, color2 in colormap.items():
-            if tag1 == tag2:
+    if distance is colorhash_delta_e and len(colormap) > 1:
+        tags = list(colormap)
+        labs = _rgb_to_lab(np.array([_rgb(color) for color in colormap.values()], dtype=float))
+        dists = _delta_e_cie1994_matrix(labs)
+        np.fill_diagonal(dists, np.inf)
+        nearest = dists.argmin(axis=1)
+        return [
+            (tag, tags[j], float(dists[i, j]))
+            for i, (tag, j) in enumerate(zip(tags, nearest))
+        ]
+
+    tags = list(colormap)
+    colors = list(colormap.values())
+    min_dists = [float('inf')] * len(tags)
+    min_tags = [''] * len(tags)
+    for i, color1 in enumerate(colors):
+        for j in range(i + 1 if symmetric else 0, len(colors)):
+            if i == j:
                 continue
-            dist = distance(color1, color2)
-            if min_dist > dist:
-                min_dist = dist
-                min_tag = tag2
+            dist = distance(color1, colors[j])
+            if min_dists[i] > dist:
+                min_dists[i] = dist
+                min_tags[i] = tags[j]
+            if symmetric and min_dists[j] > dist:
+                min_dists[j] = dist
+                min_tags[j] = tags[i]
 
-        confusion.append((tag1, min_tag, min_dist))
-    return confusion
+    return list(zip(tags, min_tags, min_dists))
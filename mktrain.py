@@ -2,10 +2,10 @@
 """
 Wizard to make a train blueprint for a given Multi-Hop route.
 """
-import heapq
+import functools
 import os.path
-import struct
 import sys
+from collections import Counter
 from csv import DictReader
 from typing import Any, Dict, Iterable, List, Sequence, Tuple
 
@@ -15,12 +15,8 @@ from colorhash import ColorHash
 import blueprints
 import colors
 
-FACTORIO_VERSION = int.from_bytes(
-    struct.pack('<HHHH',
-                1, 1, 49, 0
-                ),
-    byteorder='little',
-    signed=False)
+# int.from_bytes(struct.pack('<HHHH', 1, 1, 49, 0), byteorder='little')
+FACTORIO_VERSION = 210453463041
 
 
 PLACES = {
@@ -69,7 +65,25 @@ ELEVATORS = [
 ]
 
 
-COLORS = {place: ColorHash(f'{id}: {place}') for id, place in PLACES.items()}
+LINK_INDEX = {
+    # (Place ID, Place ID): Route ID or 'elevator'
+    # Only one direction is stored, links work both ways
+    **{
+        (left, right): route
+        for route, (left, right, _) in MHL_LINKS.items()
+    },
+    **{
+        (bottom, top): 'elevator'
+        for _, bottom, top in ELEVATORS
+    },
+}
+
+
+COLORS = {
+    # Human name: (r, g, b) in 0-1, ready for the blueprint
+    place: colors.colorhash_to_srgb(ColorHash(f'{id}: {place}')).get_value_tuple()
+    for id, place in PLACES.items()
+}
 
 
 def produce_graph():
@@ -86,40 +100,37 @@ def produce_graph():
     return graph
 
 
-def dijkstra(graph, node):
-    # Pulled from https://medium.com/nerd-for-tech/graph-traversal-in-python-bfs-dfs-dijkstra-a-star-parallel-comparision-dd4132ec323a
-    # Honestly, not sure this was a good life choice
-    # Graph is {node id: {linked node id: weight}}
-    # node is the starting place
-    distances = {node: float('inf') for node in graph}
-    distances[node] = 0
-    came_from = {node: None for node in graph}
-    queue = [(0, node)]
+def floyd_warshall(graph):
+    """
+    All-pairs shortest paths over a graph of {node id: {linked node id: weight}}
 
-    while queue:
-        current_distance, current_node = heapq.heappop(queue)
-        # relaxation
-        for next_node, weight in graph[current_node].items():
-            distance_temp = current_distance + weight
-            if distance_temp < distances[next_node]:
-                distances[next_node] = distance_temp
-                came_from[next_node] = current_node
-                heapq.heappush(queue, (distance_temp, next_node))
-    return distances, came_from
+    Returns ({from: {to: distance}}, {from: {to: next node on the way}})
+    """
+    distances = {u: {v: float('inf') for v in graph} for u in graph}
+    next_hop = {u: {v: None for v in graph} for u in graph}
+    for u, edges in graph.items():
+        distances[u][u] = 0
+        next_hop[u][u] = u
+        for v, weight in edges.items():
+            distances[u][v] = weight
+            next_hop[u][v] = v
 
+    for k in graph:
+        distances_k = distances[k]
+        for u in graph:
+            distances_u, next_u = distances[u], next_hop[u]
+            via_k = distances_u[k]
+            for v in graph:
+                distance_temp = via_k + distances_k[v]
+                if distance_temp < distances_u[v]:
+                    distances_u[v] = distance_temp
+                    next_u[v] = next_u[k]
+    return distances, next_hop
 
-def _dijkstra_route(starting: int, ending: int):
-    """
-    Produces a sequence of place IDs going from ending to starting.
 
-    Yes this is backwards. Deal with it.
-    """
-    _, came_from = dijkstra(produce_graph(), starting)
-    step = ending
-    while step != starting:
-        yield step
-        step = came_from[step]
-    yield step
+# The graph never changes, so build and route everything up front
+GRAPH = produce_graph()
+DISTANCES, NEXT_HOP = floyd_warshall(GRAPH)
 
 
 def magic_route_finder(starting: int, ending: int) -> Iterable[Tuple[int, int]]:
@@ -127,29 +138,12 @@ def magic_route_finder(starting: int, ending: int) -> Iterable[Tuple[int, int]]:
     Produces a sequence of (route ID, place ID) that'll get you from starting to
     ending.
     """
-    link_index = {
-        **{
-            (left, right): route
-            for route, (left, right, _) in MHL_LINKS.items()
-        },
-        **{
-            (right, left): route
-            for route, (left, right, _) in MHL_LINKS.items()
-        },
-        **{
-            (top, bottom): 'elevator'
-            for _, bottom, top in ELEVATORS
-        },
-        **{
-            (bottom, top): 'elevator'
-            for _, bottom, top in ELEVATORS
-        },
-    }
-    route = list(_dijkstra_route(starting, ending))
-    route.reverse()
-    steps = [route[i:i+2] for i in range(len(route) - 1)]
-    for start, end in steps:
-        yield link_index[start, end], end
+    step = starting
+    while step != ending:
+        next_step = NEXT_HOP[step][ending]
+        route = LINK_INDEX.get((step, next_step)) or LINK_INDEX[next_step, step]
+        yield route, next_step
+        step = next_step
 
 
 def prompt_for_place(prompt: str) -> int:
@@ -197,16 +191,21 @@ def prompt_for_kind(prompt: str) -> str:
             print("Must be 'cargo' or 'fluid'")
 
 
-def prompt_for_cargo(prompt: str) -> tuple[list, list]:
+def _normalize_cargo(raw: str) -> List[str]:
+    """
+    Turn a comma-separated list of cargo into Factorio item names
+    """
+    return [item.strip().lower().replace(' ', '-') for item in raw.split(',')]
+
+
+def prompt_for_cargo(prompt: str) -> List[str]:
     """
     Ask the user what cargo the train carries, returns item names
     """
-    input_cargo = input('\n'+prompt).split(',')
-    cargo = []
-    for item in input_cargo:
-        item = item.strip().lower().replace(' ', '-')
-        cargo.append(item)
-    return cargo
+    return _normalize_cargo(input('\n'+prompt))
+
+
+_DASH_TO_SPACE = str.maketrans('-', ' ')
 
 
 def make_pretty_cargo(cargo: Sequence[str]) -> List[str]:
@@ -223,8 +222,8 @@ def make_pretty_cargo(cargo: Sequence[str]) -> List[str]:
     DROP_PREFIXES = ('aai-', 'se-')
     for item in cargo:
         for prefix in DROP_PREFIXES:
-            item = item.replace(prefix, '')
-        pretty_item = item.replace('-', ' ').title()
+            item = item.removeprefix(prefix)
+        pretty_item = item.translate(_DASH_TO_SPACE).title()
         pretty_cargo.append(pretty_item)
     return pretty_cargo
 
@@ -239,24 +238,24 @@ def icon_list_to_objects(icon_list: Sequence, kind: str) -> list:
     Returns:
         list: list of objects
     """
+    if not icon_list:
+        return []
     if kind == 'cargo':
         kind = 'item'
     elif kind != 'fluid':
         kind = 'virtual'
     if isinstance(icon_list, str):
         icon_list = (icon_list,)
-    icon_objects = []
-    for icon_index, icon in enumerate(icon_list):
-        icon_objects.append(
-            {
-                'index': icon_index + 1,
-                'signal': {
-                    'name': icon,
-                    'type': kind
-                }
+    return [
+        {
+            'index': icon_index,
+            'signal': {
+                'name': icon,
+                'type': kind
             }
-        )
-    return icon_objects
+        }
+        for icon_index, icon in enumerate(icon_list, 1)
+    ]
 
 
 def get_route_list(schedule: Sequence) -> list:
@@ -270,17 +269,20 @@ def get_route_list(schedule: Sequence) -> list:
         list: list of routes taken
     """
     routes = []
+    seen = set()
     for station in schedule:
         name = station['station']
         if 'Boarding' in name:
             continue
         elif 'se-space-elevator' in name:
-            if 'Elevator' not in routes:
-                routes.append('Elevator')
+            route = 'Elevator'
         elif 'Rt' in name:
             route = f'Route {name[2:]}'
-            if route not in routes:
-                routes.append(route)
+        else:
+            continue
+        if route not in seen:
+            seen.add(route)
+            routes.append(route)
     return routes
 
 
@@ -305,10 +307,7 @@ def make_grammar_list(items: Sequence[str]) -> str:
 
 
 def make_bullet_list(items: Sequence[str]) -> str:
-    if len(items) == 0:
-        return ''
-    else:
-        return '* ' + '\n* '.join(items)
+    return '\n'.join(f'* {item}' for item in items)
 
 
 def make_description(cargo: Sequence[str], source: str, destination: str, schedule: Sequence) -> str:
@@ -321,54 +320,46 @@ def make_description(cargo: Sequence[str], source: str, destination: str, schedu
 
 def make_label(cargo: Sequence[str], destination: str) -> str:
     if len(cargo) > 3:
-        WORDS = {}
-        for item in cargo:
-            for word in item.split(' '):
-                if word not in WORDS.keys():
-                    WORDS[word] = 1
-                else:
-                    WORDS[word] += 1
-        best_word = max(WORDS, key=WORDS.get)
+        words = Counter(word for item in cargo for word in item.split(' '))
+        best_word, _ = words.most_common(1)[0]
         return f'{best_word} misc. to {destination}'
     else:
         return f"{make_grammar_list(cargo)} to {destination}"
 
 
-def schedule_start(name: str):
+def schedule_start(out: List[Dict[str, Any]], name: str):
     """
-    Produce the train stops for pickup
+    Append the train stops for pickup to out
     """
-    yield {
+    out.append({
         'station': name,
         'wait_conditions': [
             {'compare_type': 'or', 'type': 'full'},
         ],
-    }
+    })
 
 
-def schedule_end(name: str):
+def schedule_end(out: List[Dict[str, Any]], name: str):
     """
-    Produce the train stops for drop off.
+    Append the train stops for drop off to out.
     """
-    yield {
+    out.append({
         'station': name,
         'wait_conditions': [
             {'compare_type': 'or', 'type': 'empty'},
         ]
-    }
+    })
 
 
-def schedule_lobby(delay: int = 60) -> Dict[str, Any]:
+def schedule_lobby(out: List[Dict[str, Any]], delay: int = 60):
     """
-    Produce the train stops for a lobby.
+    Append the train stops for a lobby.
 
     Args:
+        out (List[Dict[str,Any]]): schedule to append station JSON objects to
         delay (int, optional): waiting time at lobby in ticks.. Defaults to 60(1s).
-
-    Yields:
-        Dict[str,Any]: station JSON object
     """
-    yield {
+    out.append({
         'station': '-Lobby',
         'wait_conditions': [
             {
@@ -377,16 +368,16 @@ def schedule_lobby(delay: int = 60) -> Dict[str, Any]:
                 'type': 'time',
             },
         ] if delay else [],
-    }
+    })
 
 
-def schedule_ship(route: int, dest: int):
+def schedule_ship(out: List[Dict[str, Any]], route: int, dest: int):
     """
-    Produce the train stops for a ship traversal.
+    Append the train stops for a ship traversal to out.
     """
 
-    yield {'station': f'Boarding Rt{route}'}
-    yield {
+    out.append({'station': f'Boarding Rt{route}'})
+    out.append({
         'station': f'Rt{route}',
         'wait_conditions': [
             {
@@ -399,89 +390,111 @@ def schedule_ship(route: int, dest: int):
                 'type': 'circuit',
             },
         ],
-    }
+    })
 
 
-def schedule_elevator_ascent(name: str) -> Iterable[Dict[str, str]]:
+def schedule_elevator_ascent(out: List[Dict[str, Any]], name: str):
     """
-    Produce the train stops for an elevator ascent
+    Append the train stops for an elevator ascent
 
     Args:
+        out (List[Dict[str,Any]]): schedule to append stops to
         name (str): surface with the elevator
-
-    Yields:
-        Dict[str,str]: schedule stops
     """
-    yield {'station': f'[img=entity/se-space-elevator]  {name} ↑'}
+    out.append({'station': f'[img=entity/se-space-elevator]  {name} ↑'})
 
 
-def schedule_elevator_descent(name: str) -> Iterable[Dict[str, str]]:
+def schedule_elevator_descent(out: List[Dict[str, Any]], name: str):
     """
-    Produce the train stops for an elevator descent
+    Append the train stops for an elevator descent
 
     Args:
+        out (List[Dict[str,Any]]): schedule to append stops to
         name (str): surface with the elevator
-
-    Yields:
-        Dict[str,str]: schedule stops
     """
-    yield {'station': f'[img=entity/se-space-elevator]  {name} ↓'}
+    out.append({'station': f'[img=entity/se-space-elevator]  {name} ↓'})
 
 
-def schedule_elevator(dest) -> Iterable[Dict[str, str]]:
+def schedule_elevator(out: List[Dict[str, Any]], dest):
     """
-    Produce the train stops for an elevator traversal.
+    Append the train stops for an elevator traversal.
 
     Args:
+        out (List[Dict[str,Any]]): schedule to append stops to
         dest (int): surface with the elevator
-
-    Yields:
-        Dict[str,str]: schedule stops
     """
-    for name, bottom, top in ELEVATORS:
-        if bottom == dest:
-            yield from schedule_elevator_descent(name)
-            return
-        elif top == dest:
-            yield from schedule_elevator_ascent(name)
-            return
-    else:
-        assert False, f"Can't find the elevator for {dest} anymore???"
+    assert dest in ELEVATOR_BY_PLACE, f"Can't find the elevator for {dest} anymore???"
+    name, schedule_traversal = ELEVATOR_BY_PLACE[dest]
+    schedule_traversal(out, name)
 
 
-def schedule_route_hops(hops: Iterable[Tuple[int, int]]):
+ELEVATOR_BY_PLACE = {
+    # Destination place ID: (surface name, stop producer)
+    **{bottom: (name, schedule_elevator_descent) for name, bottom, _ in ELEVATORS},
+    **{top: (name, schedule_elevator_ascent) for name, _, top in ELEVATORS},
+}
+
+
+def schedule_route_hops(out: List[Dict[str, Any]], hops: Iterable[Tuple[int, int]]):
     """
-    Given a list of route numbers, produce the hops.
+    Given a list of route numbers, append the hops to out.
 
     This includes all the bookend Lobby stations.
     """
     for i, (route, dest) in enumerate(hops):
         if i == 0 and route != 'elevator':
-            yield from schedule_lobby()
+            schedule_lobby(out)
         if route == 'elevator':
-            yield from schedule_elevator(dest)
-            yield from schedule_lobby(delay=0)
+            schedule_elevator(out, dest)
+            schedule_lobby(out, delay=0)
         else:
-            yield from schedule_ship(route, dest)
-            yield from schedule_lobby()
+            schedule_ship(out, route, dest)
+            schedule_lobby(out)
+
+
+@functools.lru_cache(maxsize=None)
+def _compute_hops(startplace: int, endplace: int) -> Tuple[Tuple[Tuple[int, int], ...], Tuple[Tuple[int, int], ...]]:
+    """
+    Find the (route ID, place ID) hops there and back between two places.
+
+    Cached, since a CSV tends to have many trains running between the same places.
+    """
+    route_there = tuple(magic_route_finder(startplace, endplace))
+    # Links are symmetric, so the way back is the way there in reverse
+    places = [startplace, *(p for _, p in route_there)]
+    route_back = tuple(
+        (route, place)
+        for (route, _), place in zip(reversed(route_there), reversed(places[:-1]))
+    )
+    return route_there, route_back
 
 
-def find_schedule(startname: str, startplace: int, endname: str, endplace: int):
+def find_schedule(out: List[Dict[str, Any]], startname: str, startplace: int, endname: str, endplace: int):
     """
-    Given a starting & ending station+place, find a route and produce a schedule
-    for it.
+    Given a starting & ending station+place, find a route and append its
+    schedule to out.
     """
-    route_there = list(magic_route_finder(startplace, endplace))
-    route_back = list(magic_route_finder(endplace, startplace))
+    route_there, route_back = _compute_hops(startplace, endplace)
 
     print("Route:", " -> ".join([
         PLACES[startplace], *[f"{PLACES[p]} ({rt})" for rt, p in route_there]
     ]))
 
-    yield from schedule_start(startname)
-    yield from schedule_route_hops(route_there)
-    yield from schedule_end(endname)
-    yield from schedule_route_hops(route_back)
+    schedule_start(out, startname)
+    schedule_route_hops(out, route_there)
+    schedule_end(out, endname)
+    schedule_route_hops(out, route_back)
+
+
+TRAIN_LAYOUT = [
+    # (locomotive or wagon, orientation, x position)
+    ('locomotive', 0.75, -381.99609375),
+    ('wagon', 0.25, -374.99609375),
+    ('wagon', 0.25, -367.99609375),
+    ('wagon', 0.25, -360.99609375),
+    ('wagon', 0.25, -353.99609375),
+    ('locomotive', 0.25, -346.99609375),
+]
 
 
 def build_blueprint(kind, schedule, source, destination, cargo=None, pretty_cargo=None, color=None):
@@ -498,57 +511,34 @@ def build_blueprint(kind, schedule, source, destination, cargo=None, pretty_carg
     if color is None:
         r, g, b = (1, 1, 1)
     else:
-        r, g, b = colors.colorhash_to_srgb(color).get_value_tuple()
+        r, g, b = color
 
     label = make_label(pretty_cargo, destination)
     description = make_description(pretty_cargo, source, destination, schedule)
+    # Both locomotives share one color object
+    locomotive_color = {'r': r, 'g': g, 'b': b, 'a': 0.49803921580314636}
+    entities = []
+    for entity_number, (name, orientation, x) in enumerate(TRAIN_LAYOUT, 1):
+        if name == 'locomotive':
+            entities.append({
+                'entity_number': entity_number,
+                'name': name,
+                'orientation': orientation,
+                'position': {'x': x, 'y': -81},
+                'color': locomotive_color,
+            })
+        else:
+            entities.append({
+                'entity_number': entity_number,
+                'inventory': None,
+                'name': wagon,
+                'orientation': orientation,
+                'position': {'x': x, 'y': -81},
+            })
     return {
         'blueprint': {
             'description': description,
-            'entities': [
-                {
-                    'entity_number': 1,
-                    'name': 'locomotive',
-                    'orientation': 0.75,
-                    'position': {'x': -381.99609375, 'y': -81},
-                    'color': {'r': r, 'g': g, 'b': b, 'a': 0.49803921580314636},
-                },
-                {
-                    'entity_number': 2,
-                    'inventory': None,
-                    'name': wagon,
-                    'orientation': 0.25,
-                    'position': {'x': -374.99609375, 'y': -81},
-                },
-                {
-                    'entity_number': 3,
-                    'inventory': None,
-                    'name': wagon,
-                    'orientation': 0.25,
-                    'position': {'x': -367.99609375, 'y': -81},
-                },
-                {
-                    'entity_number': 4,
-                    'inventory': None,
-                    'name': wagon,
-                    'orientation': 0.25,
-                    'position': {'x': -360.99609375, 'y': -81},
-                },
-                {
-                    'entity_number': 5,
-                    'inventory': None,
-                    'name': wagon,
-                    'orientation': 0.25,
-                    'position': {'x': -353.99609375, 'y': -81},
-                },
-                {
-                    'entity_number': 6,
-                    'name': 'locomotive',
-                    'orientation': 0.25,
-                    'position': {'x': -346.99609375, 'y': -81},
-                    'color': {'r': r, 'g': g, 'b': b, 'a': 0.49803921580314636},
-                },
-            ],
+            'entities': entities,
             'icons': cargo_icons,
             'item': 'blueprint',
             'label': label,
@@ -585,8 +575,9 @@ def main(kind=None, cargo=None,
 
     print(f'\nMoving {pretty_cargo} ({cargo})')
 
-    schedule = list(find_schedule(
-        starting_station, starting_place, ending_station, ending_place))
+    schedule = []
+    find_schedule(schedule, starting_station, starting_place,
+                  ending_station, ending_place)
 
     bp = build_blueprint(kind, schedule, PLACES[starting_place],
                          PLACES[ending_place], cargo, pretty_cargo, COLORS[PLACES[ending_place]])
@@ -646,8 +637,7 @@ if __name__ == '__main__':
 
                 train = main(
                     kind=row['Kind'],
-                    cargo=[c.strip().lower().replace(' ', '-')
-                           for c in row['Cargo'].split(',')],
+                    cargo=_normalize_cargo(row['Cargo']),
                     starting_station=row['Start Station'],
                     starting_place=int(row['Start ID']),
                     ending_station=row['End Station'],
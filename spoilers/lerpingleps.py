@@ -1,6 +1,7 @@
 """
 [SPOILER]
 """
+import numpy as np
 
 
 def prompt_for_nums(count: int, prompt: str):
@@ -24,16 +25,17 @@ def prompt_for_nums(count: int, prompt: str):
 grid_size, = prompt_for_nums(1, "Grid Size? ")
 target_cell = prompt_for_nums(2, "Target cell [x,y]? ")
 
-top_left = prompt_for_nums(3, "Top left [x,y,z]? ")
-top_right = prompt_for_nums(3, "Top right [x,y,z]? ")
-bottom_left = prompt_for_nums(3, "Bottom left [x,y,z]? ")
+top_left = np.array(prompt_for_nums(3, "Top left [x,y,z]? "))
+top_right = np.array(prompt_for_nums(3, "Top right [x,y,z]? "))
+bottom_left = np.array(prompt_for_nums(3, "Bottom left [x,y,z]? "))
 
 
 col, row = target_cell
 row -= .5
 col -= .5
 
-print([
-    (bl - tl) / grid_size * row + (tr - tl) / grid_size * col + tl
-    for tl, tr, bl in zip(top_left, top_right, bottom_left)
-])
+print((
+    (bottom_left - top_left) / grid_size * row
+    + (top_right - top_left) / grid_size * col
+    + top_left
+).tolist())